@@ -1,8 +1,249 @@
 # app.py
-import json
+from __future__ import annotations
+
+import hashlib
+import io
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
-from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import polars as pl
+
+
+def fifo_match(positions, quantities):
+    """Match closing trades against open lots in FIFO order.
+
+    Returns (entry_idx, exit_idx, matched_qty) arrays, one element per match,
+    where the indices are row positions into the input arrays.
+    """
+    n = len(positions)
+    # Every match consumes one open lot, so there are at most n matches
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    matched_qty = np.empty(n, dtype=quantities.dtype)
+    k = 0
+
+    open_lots = []  # (row, qty) of buys; consumed from `head` instead of pop(0)
+    head = 0
+
+    for i, (position, qty_to_close) in enumerate(zip(positions.tolist(), quantities.tolist())):
+        if position == 1:
+            open_lots.append((i, qty_to_close))
+            continue
+
+        while qty_to_close > 0 and head < len(open_lots):
+            entry_row, entry_qty = open_lots[head]
+            head += 1
+            matched = min(qty_to_close, entry_qty)
+
+            entry_idx[k] = entry_row
+            exit_idx[k] = i
+            matched_qty[k] = matched
+            k += 1
+
+            qty_to_close -= matched
+
+    return entry_idx[:k], exit_idx[:k], matched_qty[:k]
+
+
+# ==============================
+# CACHED STAGES
+# ==============================
+# Streamlit reruns the whole script on every widget change, so parsing and
+# the aggregations are cached; only the metric cards recompute on reruns.
+# Every stage is keyed on a content digest of the upload (file_key), and the
+# `_`-prefixed arguments are skipped by Streamlit's hashing.
+
+# Uploads kept per cache; cached frames are shared by all sessions
+CACHED_FILES_MAX = 8
+
+# Months stay dates in the data and are only rendered as YYYY-MM
+MONTH_COLUMN = st.column_config.DateColumn("Month", format="YYYY-MM")
+
+SECONDS_PER_DAY = 86_400
+# Reciprocals so day -> month / year conversions are a multiply, not a divide
+MONTHS_PER_DAY = 1 / 30.44
+YEARS_PER_DAY = 1 / 365
+
+# Rows per page of the All Trades table; the full ledger is a download
+TRADES_PAGE_SIZE = 1000
+
+# Columns each report reads; subsets are projected to these before copying
+OPTION_COLUMNS = ["Ticker", "Strike", "Expiry", "TradedTime", "Quantity", "Cashflow"]
+CASH_COLUMNS = ["Ticker", "TradedTime", "Position", "Quantity"]
+
+
+# cache_resource hands back the same frame instead of unpickling a fresh copy
+# on every rerun; callers must treat it as read-only
+@st.cache_resource(show_spinner=False, max_entries=CACHED_FILES_MAX)
+def load_trades(file_key: str, _file_bytes: bytes) -> pd.DataFrame:
+    trades = orjson.loads(_file_bytes)["data"]["trades"]
+
+    # Column-wise construction: dtype inference runs once per column instead
+    # of pandas walking the list of row dicts. Keys are unioned across rows
+    # since not every trade carries every field.
+    columns = dict.fromkeys(k for t in trades for k in t)
+    df = pd.DataFrame({k: [t.get(k) for t in trades] for k in columns}, copy=False)
+
+    # Fills often share a timestamp, so cache=True parses each distinct string once
+    df["TradedTime"] = pd.to_datetime(df["TradedTime"], format="ISO8601", cache=True)
+    # Polars cannot parse fixed-offset zones such as "+05:30", so exports
+    # with an offset are converted to naive exchange (IST) time
+    if df["TradedTime"].dt.tz is not None:
+        df["TradedTime"] = df["TradedTime"].dt.tz_convert("Asia/Kolkata").dt.tz_localize(None)
+    df = df.sort_values("TradedTime").reset_index(drop=True)
+    # Second resolution is all the reports need; downcast after sorting so
+    # sub-second fills keep their order
+    df["TradedTime"] = df["TradedTime"].dt.as_unit("s")
+
+    # Few distinct tickers / expiries: int codes make the group keys cheap,
+    # and they carry over to Polars as Categorical
+    for col in ("Ticker", "Expiry"):
+        df[col] = df[col].astype("category")
+
+    # Cashflow: one allocation, Position and sign applied in place; reused
+    # as option P&L
+    cashflow = np.multiply(
+        df["TradedPrice"].to_numpy(), df["Quantity"].to_numpy(), dtype=np.float64
+    )
+    np.multiply(cashflow, df["Position"].to_numpy(), out=cashflow)
+    np.negative(cashflow, out=cashflow)
+    df["Cashflow"] = cashflow
+    df["CumPnL"] = np.cumsum(cashflow)
+    return df
+
+
+def option_holding_periods(options: pl.LazyFrame) -> pl.LazyFrame:
+    import polars as pl
+
+    return (
+        options.group_by(["Ticker", "Strike", "Expiry"])
+        .agg(
+            pl.col("TradedTime").min().alias("EntryTime"),
+            pl.col("TradedTime").max().alias("ExitTime"),
+        )
+        .sort(["Ticker", "Strike", "Expiry"])
+        .with_columns(
+            (pl.col("ExitTime") - pl.col("EntryTime")).dt.total_days().alias("HoldingDays")
+        )
+        .with_columns(
+            (pl.col("HoldingDays") * MONTHS_PER_DAY).round(2).alias("HoldingMonths")
+        )
+    )
+
+
+def monthly_option_pnl(options: pl.LazyFrame) -> pl.LazyFrame:
+    # Built lazily so Polars plans month/group/sort/select as one pipeline
+    import polars as pl
+
+    return (
+        # Month as a Date (int32 days) so grouping hashes integers, not
+        # strings; per-execution P&L is the Cashflow already computed on load
+        options.with_columns(
+            pl.col("TradedTime").dt.truncate("1mo").cast(pl.Date).alias("Month")
+        )
+        # Group SELL + BUY into ONE net result
+        .group_by(["Month", "Ticker", "Strike", "Expiry"])
+        .agg(
+            pl.col("Quantity").sum().alias("Contracts"),
+            pl.col("Cashflow").sum().alias("Profit / Loss (₹)"),
+        )
+        # Sort on every group key: group_by order is arbitrary, so ties on
+        # fewer keys would come back in a different order each run
+        .sort(["Month", "Ticker", "Strike", "Expiry"])
+        .select(
+            "Month",
+            "Ticker",
+            "Strike",
+            # Option type fixed for Wheel view
+            pl.lit("PE").cast(pl.Categorical).alias("OptionType"),
+            "Expiry",
+            "Contracts",
+            "Profit / Loss (₹)",
+        )
+    )
+
+
+def cash_holding_periods(cash_df: pd.DataFrame) -> pd.DataFrame:
+    entry_idx, exit_idx, matched_qty = fifo_match(
+        cash_df["Position"].to_numpy(), cash_df["Quantity"].to_numpy()
+    )
+
+    # Naive datetime64[s] since load_trades
+    cash_times = cash_df["TradedTime"].to_numpy()
+    entry_times = cash_times[entry_idx]
+    exit_times = cash_times[exit_idx]
+
+    # Whole days held as plain int64 arithmetic on epoch seconds
+    epoch_s = cash_times.view(np.int64)
+    holding_days = (epoch_s[exit_idx] - epoch_s[entry_idx]) // SECONDS_PER_DAY
+
+    return pd.DataFrame(
+        {
+            "Ticker": cash_df["Ticker"].array[exit_idx],
+            "EntryTime": entry_times,
+            "ExitTime": exit_times,
+            "Quantity": matched_qty,
+            "HoldingDays": holding_days,
+            "HoldingMonths": np.round(holding_days * MONTHS_PER_DAY, 2),
+        },
+        copy=False,
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHED_FILES_MAX)
+def trade_reports(file_key: str, _df: pd.DataFrame):
+    """Option holding, monthly net option P&L, month-wise totals and cash holding."""
+    # Polars is only needed once a file is uploaded; keep it off the cold
+    # start of the landing page
+    import polars as pl
+
+    # One Strike scan splits options from cash / underlying
+    is_option = _df["Strike"].notna().to_numpy()
+
+    # Only the columns the aggregations read cross over to Arrow
+    options = pl.from_pandas(_df.loc[is_option, OPTION_COLUMNS]).lazy()
+
+    monthly_net = monthly_option_pnl(options)
+    month_total = (
+        monthly_net.group_by("Month")
+        .agg(pl.col("Profit / Loss (₹)").sum())
+        .sort("Month")
+    )
+    # One execution for all three plans: the shared scan and the monthly
+    # aggregation under month_total are computed once
+    option_holding, monthly_net, month_total = pl.collect_all(
+        [option_holding_periods(options), monthly_net, month_total]
+    )
+    cash_holding_df = cash_holding_periods(_df.loc[~is_option, CASH_COLUMNS])
+    return option_holding, monthly_net, month_total, cash_holding_df
+
+
+def month_total_chart(month_total: pd.DataFrame):
+    # Month is a datetime, so Vega-Lite uses a time scale rather than
+    # sorting YYYY-MM strings as categories
+    import altair as alt
+
+    return (
+        alt.Chart(month_total)
+        .mark_line()
+        .encode(
+            x=alt.X("Month", type="temporal", axis=alt.Axis(format="%Y-%m")),
+            y=alt.Y("Profit / Loss (₹)", type="quantitative"),
+        )
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHED_FILES_MAX)
+def trades_parquet(file_key: str, _df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    _df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
 
 st.set_page_config(page_title="AlgoTest Trade Analyzer", layout="wide")
 
@@ -25,17 +266,10 @@ if uploaded_file is not None:
     # ==============================
     # LOAD FILE
     # ==============================
-    data = json.load(uploaded_file)
-    df = pd.DataFrame(data["data"]["trades"])
-
-    df["TradedTime"] = pd.to_datetime(df["TradedTime"])
-    df = df.sort_values("TradedTime").reset_index(drop=True)
-
-    # ==============================
-    # CASHFLOW
-    # ==============================
-    df["Cashflow"] = -df["Position"] * df["TradedPrice"] * df["Quantity"]
-    df["CumPnL"] = df["Cashflow"].cumsum()
+    file_bytes = uploaded_file.getvalue()
+    # Hash the upload once per rerun; every cached stage is keyed on it
+    file_key = hashlib.sha256(file_bytes).hexdigest()
+    df = load_trades(file_key, file_bytes)
 
     # ==============================
     # STRATEGY DURATION
@@ -44,8 +278,8 @@ if uploaded_file is not None:
     end_date = df["TradedTime"].max()
 
     total_days = (end_date - start_date).days
-    total_months = round(total_days / 30.44, 2)
-    total_years = round(total_days / 365, 2)
+    total_months = round(total_days * MONTHS_PER_DAY, 2)
+    total_years = round(total_days * YEARS_PER_DAY, 2)
 
     total_pnl = df["Cashflow"].sum()
     return_pct = (total_pnl / capital * 100) if capital > 0 else 0
@@ -60,132 +294,80 @@ if uploaded_file is not None:
     col3.metric("Trading Duration", f"{total_months} months")
     col4.metric("Date Range", f"{start_date.date()} → {end_date.date()}")
 
-    # ==============================
-    # EQUITY CURVE
-    # ==============================
-    st.subheader("📈 Equity Curve")
-    st.line_chart(df.set_index("TradedTime")["CumPnL"])
+    option_holding, monthly_net, month_total, cash_holding_df = trade_reports(file_key, df)
 
-    # ==============================
-    # OPTION HOLDING
-    # ==============================
-    st.subheader("⏱ Option Holding Period")
-    option_df = df[df["Strike"].notna()].copy()
-
-    if not option_df.empty:
-        option_holding = (
-            option_df.groupby(["Ticker", "Strike", "Expiry"])
-            .agg(
-                EntryTime=("TradedTime", "min"),
-                ExitTime=("TradedTime", "max"),
-            )
-            .reset_index()
-        )
+    summary_tab, ows_tab = st.tabs(["Summary", "OWS"])
 
-        option_holding["HoldingDays"] = (
-            option_holding["ExitTime"] - option_holding["EntryTime"]
-        ).dt.days
-        option_holding["HoldingMonths"] = round(option_holding["HoldingDays"] / 30.44, 2)
+    with summary_tab:
+        # ==============================
+        # EQUITY CURVE
+        # ==============================
+        st.subheader("📈 Equity Curve")
+        st.line_chart(df.set_index("TradedTime")["CumPnL"])
 
-        st.dataframe(option_holding, use_container_width=True)
-    else:
-        st.info("No option trades found")
+        # ==============================
+        # OPTION HOLDING
+        # ==============================
+        st.subheader("⏱ Option Holding Period")
 
-    # ==============================
-    # CASH HOLDING (FIFO)
-    # ==============================
-    st.subheader("⏱ Cash / Underlying Holding Period")
-    cash_df = df[df["Strike"].isna()].copy()
+        if not option_holding.is_empty():
+            st.dataframe(option_holding.to_pandas(), use_container_width=True)
+        else:
+            st.info("No option trades found")
 
-    cash_positions = []
-    open_positions = []
+        # ==============================
+        # CASH HOLDING (FIFO)
+        # ==============================
+        st.subheader("⏱ Cash / Underlying Holding Period")
 
-    for _, row in cash_df.iterrows():
-        if row["Position"] == 1:
-            open_positions.append(row.copy())
+        if not cash_holding_df.empty:
+            st.dataframe(cash_holding_df, use_container_width=True)
         else:
-            qty_to_close = row["Quantity"]
-
-            while qty_to_close > 0 and open_positions:
-                entry = open_positions.pop(0)
-                matched_qty = min(qty_to_close, entry["Quantity"])
-
-                cash_positions.append(
-                    {
-                        "Ticker": row["Ticker"],
-                        "EntryTime": entry["TradedTime"],
-                        "ExitTime": row["TradedTime"],
-                        "Quantity": matched_qty,
-                        "HoldingDays": (row["TradedTime"] - entry["TradedTime"]).days,
-                    }
-                )
-
-                qty_to_close -= matched_qty
-
-    if cash_positions:
-        cash_holding_df = pd.DataFrame(cash_positions)
-        cash_holding_df["HoldingMonths"] = round(
-            cash_holding_df["HoldingDays"] / 30.44, 2
+            st.info("No cash / underlying positions found")
+
+        # ==============================
+        # ALL TRADES
+        # ==============================
+        st.subheader("📋 All Trades")
+
+        # Ship one page to the browser instead of the whole ledger
+        page_count = max(1, -(-len(df) // TRADES_PAGE_SIZE))
+        page = 1
+        if page_count > 1:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+
+        start = (page - 1) * TRADES_PAGE_SIZE
+        page_df = df.iloc[start:start + TRADES_PAGE_SIZE]
+
+        st.caption(f"Rows {start + 1:,}–{start + len(page_df):,} of {len(df):,}")
+        st.dataframe(pa.Table.from_pandas(page_df, preserve_index=False), use_container_width=True)
+        st.download_button(
+            "Download all trades (Parquet)",
+            data=trades_parquet(file_key, df),
+            file_name="trades.parquet",
+            mime="application/vnd.apache.parquet",
         )
-        st.dataframe(cash_holding_df, use_container_width=True)
-    else:
-        st.info("No cash / underlying positions found")
 
-    # ==============================
-    # ALL TRADES
-    # ==============================
-    # ==============================
-    # OWS MONTHLY NET OPTION P&L (SELL + BUY MERGED)
-    # ==============================
-    st.subheader("🌀 Option Wheel – Monthly Net Option P&L")
-
-    ows_df = df.copy()
-
-    # Keep only option trades (ignore cash / underlying)
-    opt_df = ows_df[ows_df["Strike"].notna()].copy()
+    with ows_tab:
+        # ==============================
+        # OWS MONTHLY NET OPTION P&L (SELL + BUY MERGED)
+        # ==============================
+        st.subheader("🌀 Option Wheel – Monthly Net Option P&L")
 
-    # Month
-    opt_df["Month"] = opt_df["TradedTime"].dt.to_period("M").astype(str)
-
-    # Unified P&L per execution
-    opt_df["PnL"] = -opt_df["Position"] * opt_df["TradedPrice"] * opt_df["Quantity"]
-
-    # Group SELL + BUY into ONE net result
-    monthly_net = (
-        opt_df.groupby([
-            "Month",
-            "Ticker",
-            "Strike",
-            "Expiry",
-        ])
-        .agg(
-            Contracts=("Quantity", "sum"),
-            Net_Profit_Loss=("PnL", "sum")
+        st.dataframe(
+            monthly_net.to_pandas(),
+            use_container_width=True,
+            column_config={"Month": MONTH_COLUMN},
         )
-        .reset_index()
-        .sort_values(["Month", "Ticker", "Strike"])
-    )
-
-    # Option type fixed for Wheel view
-    monthly_net.insert(3, "OptionType", "PE")
 
-    monthly_net.rename(
-        columns={"Net_Profit_Loss": "Profit / Loss (₹)"},
-        inplace=True,
-    )
+        # ==============================
+        # MONTH-WISE TOTAL OPTION PROFIT
+        # ==============================
+        st.subheader("💰 Month-wise Total Option Profit (Net)")
 
-    st.dataframe(monthly_net, use_container_width=True)
+        month_total = month_total.to_pandas()
 
-    # ==============================
-    # MONTH-WISE TOTAL OPTION PROFIT
-    # ==============================
-    st.subheader("💰 Month-wise Total Option Profit (Net)")
-
-    month_total = (
-        monthly_net.groupby("Month")["Profit / Loss (₹)"]
-        .sum()
-        .reset_index()
-    )
-
-    st.dataframe(month_total, use_container_width=True)
-    st.line_chart(month_total.set_index("Month")["Profit / Loss (₹)"])
+        st.dataframe(
+            month_total, use_container_width=True, column_config={"Month": MONTH_COLUMN}
+        )
+        st.altair_chart(month_total_chart(month_total), use_container_width=True)